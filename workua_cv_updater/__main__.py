@@ -2,17 +2,20 @@
 
 import logging
 import argparse
+import asyncio
 import enum
 import os
 import os.path
+import re
 import sqlite3
 import signal
-from time import sleep, time, ctime, localtime, strftime
-from random import randrange, random
+import threading
+from time import sleep, time, monotonic, ctime, localtime, strftime
+from random import randrange, random, uniform
 import collections
-from heapq import merge
 from contextlib import contextmanager
 import json
+import base64
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -26,15 +29,22 @@ from selenium.common.exceptions import (TimeoutException,
                                         ElementClickInterceptedException,
                                         WebDriverException)
 from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.utils import ChromeType
+from webdriver_manager.utils import ChromeType, chrome_version
 
 RESUME_LIST_URL = "https://www.work.ua/ru/jobseeker/my/resumes/"
-RESUME_LIST_URL_PATTERN = r"^https://www\.work\.ua/(ru/)?jobseeker/my/resumes/?$"
+RESUME_LIST_URL_PATTERN = re.compile(r"^https://www\.work\.ua/(ru/)?jobseeker/my/resumes/?$")
 LOGIN_URL = "https://www.work.ua/jobseeker/login/"
-POST_LOGIN_URL_PATTERN = r"^https://www\.work\.ua/(ru/)?jobseeker/my/?$"
-CREATE_URL_PATTERN = r"^https://www.work.ua/(ru/)?jobseeker/my/resumes/create/?(\?.*)?$"
-UPDATE_BUTTON_XPATH = "//a[contains(@href, '/update/expire_date')]"
-CREATE_BUTTON_XPATH = "//a[contains(@href, '/jobseeker/my/resumes/create')]"
+POST_LOGIN_URL_PATTERN = re.compile(r"^https://www\.work\.ua/(ru/)?jobseeker/my/?$")
+CREATE_URL_PATTERN = re.compile(r"^https://www.work.ua/(ru/)?jobseeker/my/resumes/create/?(\?.*)?$")
+UPDATE_BUTTON_CSS = 'a[href*="/update/expire_date"]'
+UPDATE_LINKS_JS = ("return Array.from(document.querySelectorAll(arguments[0]))"
+                   ".map(a => a.href)")
+FIND_UPDATE_LINK_JS = ("return Array.from(document.querySelectorAll(arguments[0]))"
+                       ".find(a => a.href === arguments[1]) || null")
+FETCH_URL_JS = ("var done = arguments[arguments.length - 1];"
+                "fetch(arguments[0], {credentials: 'include'})"
+                ".then(r => done([r.status, r.url]), e => done([-1, null]));")
+CREATE_BUTTON_SELECTOR = (By.CSS_SELECTOR, 'a[href*="/jobseeker/my/resumes/create"]')
 UPDATE_INTERVAL = 7 * 24 * 3600
 UPDATE_INTERVAL_MIN_DRIFT = 10
 UPDATE_INTERVAL_MAX_DRIFT = 60
@@ -43,6 +53,18 @@ SESSION_REFRESH_INTERVAL_MIN_DRIFT = 10
 SESSION_REFRESH_INTERVAL_MAX_DRIFT = 60
 MANUAL_LOGIN_TIMEOUT = 3600
 REFRESH_WAIT = 10
+FAST_POLL_FREQUENCY = 0.1
+BROWSER_IDLE_TIMEOUT = 2 * SESSION_REFRESH_INTERVAL
+BROWSER_REAPER_INTERVAL = 60
+MAX_SLEEP_CHUNK = 60
+
+MAIN_LOG = logging.getLogger("MAIN")
+UPDATE_LOG = logging.getLogger("UPDATE")
+LOGIN_LOG = logging.getLogger("LOGIN")
+REFRESH_LOG = logging.getLogger("REFRESH")
+EVLOOP_LOG = logging.getLogger("EVLOOP")
+GUARD_LOG = logging.getLogger("GUARD")
+POOL_LOG = logging.getLogger("POOL")
 
 DB_INIT = [
     "CREATE TABLE IF NOT EXISTS update_ts (\n"
@@ -50,12 +72,28 @@ DB_INIT = [
     "value REAL NOT NULL DEFAULT 0)\n"
 ]
 
-def wall_clock_wait(when, precision=1.):
+async def wall_clock_wait(when, stop, precision=MAX_SLEEP_CHUNK):
     """ Sleep variation which is doesn't increases
-    sleep duration when computer enters suspend/hybernation
+    sleep duration when computer enters suspend/hybernation.
+    Wall clock is rechecked at least every `precision` seconds.
+    Returns early once `stop` event is set.
     """
-    while time() < when:
-        sleep(precision)
+    while not stop.is_set():
+        remaining = when - time()
+        if remaining <= 0:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), min(remaining, precision))
+        except asyncio.TimeoutError:
+            pass
+
+def wait_for_ready(browser, timeout):
+    """ Wait until current page DOM is loaded. Returns as soon as
+    document leaves "loading" state instead of sleeping fixed time.
+    """
+    WebDriverWait(browser, timeout, poll_frequency=FAST_POLL_FREQUENCY).until(
+        lambda d: d.execute_script("return document.readyState") != "loading"
+    )
 
 def setup_logger(name, verbosity):
     logger = logging.getLogger(name)
@@ -98,53 +136,52 @@ class ScheduledEvent(enum.Enum):
     REFRESH = 1
     UPDATE = 2
 
-ScheduleEntry = collections.namedtuple('ScheduleEntry', ('when', 'what'))
-
 def update(browser, timeout):
-    logger = logging.getLogger("UPDATE")
+    logger = UPDATE_LOG
     browser.get(RESUME_LIST_URL)
-    visited_urls = set()
-    while True:
-        for elem in browser.find_elements_by_xpath(UPDATE_BUTTON_XPATH):
-            href = elem.get_attribute("href")
-            logger.debug("Update link href = %s", repr(href))
-            if href in visited_urls:
-                continue
-            sleep(1 + 2 * random())
-            elem.click()
-            visited_urls.add(href)
-            logger.debug("Clicked!")
-            WebDriverWait(browser, timeout).until(
-                EC.staleness_of(elem)
-            )
-            WebDriverWait(browser, timeout).until(
-                EC.url_matches(RESUME_LIST_URL_PATTERN)
-            )
-            break
-        else:
-            break
+    wait = WebDriverWait(browser, timeout, poll_frequency=FAST_POLL_FREQUENCY)
+    hrefs = browser.execute_script(UPDATE_LINKS_JS, UPDATE_BUTTON_CSS)
+    for href in collections.OrderedDict.fromkeys(hrefs):
+        logger.debug("Update link href = %s", repr(href))
+        sleep(1 + 2 * random())
+        status, url = browser.execute_async_script(FETCH_URL_JS, href)
+        if status == 200 and RESUME_LIST_URL_PATTERN.match(url):
+            logger.debug("Fetched!")
+            continue
+        logger.warning("Update link fetch ended with status %s at %s. "
+                       "Falling back to click.", status, repr(url))
+        elem = browser.execute_script(FIND_UPDATE_LINK_JS,
+                                      UPDATE_BUTTON_CSS, href)
+        if elem is None:
+            logger.warning("Update link %s is gone from the page.", repr(href))
+            continue
+        elem.click()
+        logger.debug("Clicked!")
+        wait.until(EC.staleness_of(elem))
+        wait.until(EC.url_matches(RESUME_LIST_URL_PATTERN))
     logger.info('Updated!')
 
 def login(browser, timeout):
-    logger = logging.getLogger("LOGIN")
+    logger = LOGIN_LOG
     browser.get(LOGIN_URL)
     WebDriverWait(browser, timeout).until(
         EC.url_matches(POST_LOGIN_URL_PATTERN)
     )
-    sleep(REFRESH_WAIT)
+    wait_for_ready(browser, REFRESH_WAIT)
     logger.info('Successfully logged in!')
 
 def refresh(browser, timeout):
-    logger = logging.getLogger("REFRESH")
+    logger = REFRESH_LOG
     browser.get(RESUME_LIST_URL)
-    elem = WebDriverWait(browser, timeout).until(
-        EC.visibility_of_element_located((By.XPATH, CREATE_BUTTON_XPATH))
+    wait = WebDriverWait(browser, timeout, poll_frequency=FAST_POLL_FREQUENCY)
+    elem = wait.until(
+        EC.visibility_of_element_located(CREATE_BUTTON_SELECTOR)
     )
     elem.click()
-    WebDriverWait(browser, timeout).until(
+    wait.until(
         EC.url_matches(CREATE_URL_PATTERN)
     )
-    sleep(REFRESH_WAIT)
+    wait_for_ready(browser, REFRESH_WAIT)
     logger.info('Session refreshed')
 
 def parse_args():
@@ -206,7 +243,8 @@ def parse_args():
     return parser.parse_args()
 
 class BrowserFactory:
-    def __init__(self, profile_dir, screenshot_dir, browser_type, headless=True):
+    def __init__(self, profile_dir, screenshot_dir, browser_type, headless=True,
+                 driver_cache=None):
         chrome_options = Options()
         # option below causes webdriver process remaining in memory
         # chrome_options.add_argument('--no-sandbox')
@@ -214,165 +252,313 @@ class BrowserFactory:
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('user-data-dir=' + profile_dir)
         chrome_options.add_argument('window-size=1920,1055')
+        # return control once DOM is ready, don't wait for subresources
+        chrome_options.set_capability("pageLoadStrategy", "eager")
         if headless:
             chrome_options.add_argument('--headless')
+            # update mode needs only page markup, so skip heavy content
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_argument('--disable-extensions')
+            chrome_options.add_argument('--disable-background-networking')
+            chrome_options.add_argument('--disable-renderer-backgrounding')
         self._options = chrome_options
-        self._driver = ChromeDriverManager(chrome_type=browser_type).install()
+        self._browser_type = browser_type
+        self._driver_cache = driver_cache
+        self._driver = self._cached_driver()
+        self._driver_cached = self._driver is not None
+        if not self._driver_cached:
+            self._driver = self._install_driver()
         self._screenshot_dir = screenshot_dir
 
+    def _cache_key(self):
+        try:
+            return [self._browser_type, chrome_version(self._browser_type)]
+        except Exception:
+            return None
+
+    def _cached_driver(self):
+        if self._driver_cache is None:
+            return None
+        try:
+            with open(self._driver_cache) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict):
+            return None
+        key = self._cache_key()
+        if key is None or cached.get("key") != key:
+            return None
+        path = cached.get("path")
+        if not path or not os.path.isfile(path):
+            return None
+        return path
+
+    def _install_driver(self):
+        driver = ChromeDriverManager(chrome_type=self._browser_type).install()
+        key = self._cache_key()
+        if self._driver_cache is not None and key is not None:
+            try:
+                with open(self._driver_cache, 'w') as f:
+                    json.dump({"key": key, "path": driver}, f)
+            except OSError as exc:
+                MAIN_LOG.warning(
+                    "Unable to save webdriver path cache: %s", str(exc))
+        return driver
+
     def new(self):
-        return webdriver.Chrome(
-            self._driver,
-            options=self._options)
+        try:
+            return webdriver.Chrome(
+                self._driver,
+                options=self._options)
+        except WebDriverException:
+            if not self._driver_cached:
+                raise
+            self._driver = self._install_driver()
+            self._driver_cached = False
+            return webdriver.Chrome(
+                self._driver,
+                options=self._options)
 
     @property
     def screenshot_dir(self):
         return self._screenshot_dir
 
-class UpdateTracker:
-    def __init__(self, dbpath):
-        conn = sqlite3.connect(dbpath)
-        cur = conn.cursor()
+class BrowserPool:
+    """ Keeps single browser instance warm between uses. Browser is
+    spawned lazily and quit by reaper thread after it stays idle for
+    idle_timeout seconds.
+    """
+    def __init__(self, browser_factory, idle_timeout=BROWSER_IDLE_TIMEOUT):
+        self._factory = browser_factory
+        self._idle_timeout = idle_timeout
+        self._browser = None
+        self._last_used = monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, daemon=True)
+        self._reaper.start()
+
+    def acquire(self):
+        self._lock.acquire()
         try:
-            for q in DB_INIT:
-                cur.execute(q)
-            conn.commit()
-            cur.execute("SELECT 1 FROM update_ts WHERE name = ?", ("last",))
-            if cur.fetchone() is None:
-                cur.execute("INSERT INTO update_ts (name, value) VALUES (?,?)",
-                            ("last", 0.))
-                conn.commit()
-            cur.execute("SELECT 1 FROM update_ts WHERE name = ?", ("login",))
-            if cur.fetchone() is None:
-                cur.execute("INSERT INTO update_ts (name, value) VALUES (?,?)",
-                            ("login", 0.))
-                conn.commit()
-        finally:
-            cur.close()
-        self._conn = conn
+            if self._browser is None:
+                self._browser = self._factory.new()
+            return self._browser
+        except BaseException:
+            self._lock.release()
+            raise
 
-    def last_update(self):
-        cur = self._conn.cursor()
+    def release(self, browser, broken=False):
+        logger = POOL_LOG
         try:
-            cur.execute("SELECT value FROM update_ts WHERE name = ?",
-                        ("last",))
-            return cur.fetchone()[0]
+            if not broken:
+                try:
+                    browser.get("about:blank")
+                except Exception as exc:
+                    logger.warning("Browser reset failed: %s", str(exc))
+                    broken = True
+            if broken:
+                self._destroy()
+            self._last_used = monotonic()
         finally:
-            cur.close()
+            self._lock.release()
 
-    def last_login(self):
-        cur = self._conn.cursor()
-        try:
-            cur.execute("SELECT value FROM update_ts WHERE name = ?",
-                        ("login",))
-            return cur.fetchone()[0]
-        finally:
-            cur.close()
+    def _destroy(self):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                browser.quit()
+            except Exception as exc:
+                POOL_LOG.warning("Browser quit failed: %s", str(exc))
+
+    def _reap(self):
+        logger = POOL_LOG
+        while not self._stop.wait(BROWSER_REAPER_INTERVAL):
+            with self._lock:
+                if (self._browser is not None and
+                        monotonic() - self._last_used > self._idle_timeout):
+                    logger.debug("Browser is idle. Shutting it down.")
+                    self._destroy()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._destroy()
+
+    @property
+    def screenshot_dir(self):
+        return self._factory.screenshot_dir
+
+class UpdateTracker:
+    SQL_INIT_ROWS = ("INSERT OR IGNORE INTO update_ts (name, value) "
+                     "VALUES ('last', 0), ('login', 0)")
+    SQL_STATE = ("SELECT name, value FROM update_ts "
+                 "WHERE name IN ('last', 'login')")
+    SQL_SET = "UPDATE update_ts SET value = ? WHERE name = ? AND value < ?"
+
+    def __init__(self, dbpath):
+        conn = sqlite3.connect(dbpath)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with conn:
+            for q in DB_INIT:
+                conn.execute(q)
+            conn.execute(self.SQL_INIT_ROWS)
+        self._conn = conn
 
-    def update(self, ts):
-        c = self._conn
-        with c:
-            c.execute("UPDATE update_ts SET value = ? WHERE name = ? AND value < ?",
-                      (float(ts), "last", float(ts)))
+    def state(self):
+        """ Returns (last_update, last_login) pair """
+        values = dict(self._conn.execute(self.SQL_STATE))
+        return values["last"], values["login"]
 
-    def login(self, ts):
-        c = self._conn
-        with c:
-            c.execute("UPDATE update_ts SET value = ? WHERE name = ? AND value < ?",
-                      (float(ts), "login", float(ts)))
+    def set_ts(self, name, ts):
+        ts = float(ts)
+        with self._conn:
+            self._conn.execute(self.SQL_SET, (ts, name, ts))
 
     def close(self):
         self._conn.close()
         self._conn = None
 
 def random_interval(base, min_drift, max_drift):
-    return base + min_drift + random() * (max_drift - min_drift)
+    return base + uniform(min_drift, max_drift)
 
-class Scheduler:
-    def __init__(self, last_login, last_update):
-        self._it = self._iter_events(last_login, last_update)
+def refresh_interval():
+    return random_interval(SESSION_REFRESH_INTERVAL,
+                           SESSION_REFRESH_INTERVAL_MIN_DRIFT,
+                           SESSION_REFRESH_INTERVAL_MAX_DRIFT)
 
-    def __iter__(self):
-        return self
+def update_interval():
+    return random_interval(UPDATE_INTERVAL,
+                           UPDATE_INTERVAL_MIN_DRIFT,
+                           UPDATE_INTERVAL_MAX_DRIFT)
 
-    def __next__(self):
-        return next(self._it)
-
-    @staticmethod
-    def _event_stream(token, last_occured, base, min_drift, max_drift):
-        t = max(last_occured + random_interval(base, min_drift, max_drift), time())
-        yield ScheduleEntry(when=t, what=token)
-        while True:
-            t += random_interval(base, min_drift, max_drift)
-            yield ScheduleEntry(when=t, what=token)
-
-    @staticmethod
-    def _iter_events(last_login, last_update):
-        return merge(
-            Scheduler._event_stream(ScheduledEvent.REFRESH,
-                                    last_login,
-                                    SESSION_REFRESH_INTERVAL,
-                                    SESSION_REFRESH_INTERVAL_MIN_DRIFT,
-                                    SESSION_REFRESH_INTERVAL_MAX_DRIFT),
-            Scheduler._event_stream(ScheduledEvent.UPDATE,
-                                    last_update,
-                                    UPDATE_INTERVAL,
-                                    UPDATE_INTERVAL_MIN_DRIFT,
-                                    UPDATE_INTERVAL_MAX_DRIFT),
-            key=lambda ev: ev.when
-        )
+def next_event(last_login, last_update, not_before):
+    """ Returns (when, what) pair for the nearest scheduled event.
+    `not_before` maps event to the earliest time it may be retried.
+    """
+    now = time()
+    next_refresh = max(last_login + refresh_interval(),
+                       not_before[ScheduledEvent.REFRESH], now)
+    next_update = max(last_update + update_interval(),
+                      not_before[ScheduledEvent.UPDATE], now)
+    if next_refresh <= next_update:
+        return next_refresh, ScheduledEvent.REFRESH
+    return next_update, ScheduledEvent.UPDATE
+
+def dump_browser_state(browser, screenshot_dir):
+    """ Log current URL, cookies and save screenshot. Each step is
+    guarded separately so degraded browser doesn't mask original error.
+    """
+    logger = GUARD_LOG
+    try:
+        logger.warning("Current URL: %s", browser.current_url)
+    except Exception as exc:
+        logger.warning("Unable to get current URL: %s", str(exc))
+    try:
+        cookies = browser.execute_cdp_cmd("Network.getAllCookies", {})
+        logger.warning("Cookies: \n%s",
+                       json.dumps(cookies.get("cookies"), indent=4))
+    except Exception as exc:
+        logger.warning("Unable to get cookies: %s", str(exc))
+    try:
+        ss = browser.execute_cdp_cmd("Page.captureScreenshot", {})
+        ss_filename = strftime("err-%Y-%m-%d-%H-%M-%S.png", localtime())
+        ss_path = os.path.join(screenshot_dir, ss_filename)
+        with open(ss_path, 'wb') as f:
+            f.write(base64.b64decode(ss["data"]))
+        logger.warning("Screenshot saved to %s", ss_path)
+    except Exception as exc:
+        logger.warning("Unable to save screenshot: %s", str(exc))
 
 @contextmanager
-def managed_browser(browser_factory):
-    logger = logging.getLogger("GUARD")
-    browser = browser_factory.new()
+def managed_browser(pool):
+    logger = GUARD_LOG
+    browser = pool.acquire()
+    broken = False
     try:
         yield browser
     except WebDriverException as exc:
+        broken = True
         logger.warning("WebDriver exception occured: %s. Saving essential data...", str(exc))
-        logger.warning("Current URL: %s", browser.current_url)
-        logger.warning("Cookies: \n%s", json.dumps(browser.get_cookies(), indent=4))
-        ss_filename = strftime("err-%Y-%m-%d-%H-%M-%S.png", localtime())
-        ss_path = os.path.join(browser_factory.screenshot_dir, ss_filename)
-        browser.save_screenshot(ss_path)
-        logger.warning("Screenshot saved to %s", ss_path)
+        dump_browser_state(browser, pool.screenshot_dir)
+        raise
+    except Exception:
+        broken = True
         raise
     else:
-        logger.debug("Current URL: %s", browser.current_url)
-        logger.debug("Cookies: \n%s", json.dumps(browser.get_cookies(), indent=4))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Current URL: %s", browser.current_url)
+            logger.debug("Cookies: \n%s", json.dumps(browser.get_cookies(), indent=4))
     finally:
-        browser.quit()
-
-def update_loop(browser_factory, tracker, timeout):
-    logger = logging.getLogger("EVLOOP")
-    last_update = tracker.last_update()
-    last_login = tracker.last_login()
+        pool.release(browser, broken)
+
+def run_refresh(pool, timeout):
+    with managed_browser(pool) as browser:
+        refresh(browser, timeout)
+
+def run_update(pool, timeout):
+    with managed_browser(pool) as browser:
+        update(browser, timeout)
+
+async def update_loop(pool, tracker, timeout):
+    logger = EVLOOP_LOG
+    loop = asyncio.get_event_loop()
+    stop = asyncio.Event()
+    signals = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        prev_handler = signal.getsignal(signum)
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            pass
+        else:
+            signals.append((signum, prev_handler))
+    last_update, last_login = tracker.state()
     logger.info("Starting scheduler. "
                 "Last update @ %.3f (%s); last refresh @ %.3f (%s).",
                 last_update, ctime(last_update),
                 last_login, ctime(last_login))
-    for ev in Scheduler(last_login, last_update):
-        logger.info("Next event is %s @ %.3f (%s)",
-                    ev.what.name, ev.when, ctime(ev.when))
-        wall_clock_wait(ev.when)
-        try:
-            if ev.what is ScheduledEvent.REFRESH:
-                logger.info("Refreshing session now!")
-                with managed_browser(browser_factory) as browser:
-                    refresh(browser, timeout)
-                tracker.login(time())
-            elif ev.what is ScheduledEvent.UPDATE:
-                logger.info("Updating CVs now!")
-                with managed_browser(browser_factory) as browser:
-                    try:
-                        update(browser, timeout)
-                    except WebDriverException as exc:
-                        raise
-                tracker.update(time())
-        except KeyboardInterrupt:
-            raise
-        except Exception as exc:
-            logger.exception("Event %s handling failed: %s", ev.what.name, str(exc))
+    not_before = {
+        ScheduledEvent.REFRESH: 0.,
+        ScheduledEvent.UPDATE: 0.,
+    }
+    intervals = {
+        ScheduledEvent.REFRESH: refresh_interval,
+        ScheduledEvent.UPDATE: update_interval,
+    }
+    try:
+        while True:
+            last_update, last_login = tracker.state()
+            when, what = next_event(last_login, last_update, not_before)
+            logger.info("Next event is %s @ %.3f (%s)",
+                        what.name, when, ctime(when))
+            await wall_clock_wait(when, stop)
+            if stop.is_set():
+                raise KeyboardInterrupt
+            not_before[what] = when + intervals[what]()
+            try:
+                if what is ScheduledEvent.REFRESH:
+                    logger.info("Refreshing session now!")
+                    await loop.run_in_executor(None, run_refresh, pool, timeout)
+                    tracker.set_ts("login", time())
+                elif what is ScheduledEvent.UPDATE:
+                    logger.info("Updating CVs now!")
+                    await loop.run_in_executor(None, run_update, pool, timeout)
+                    now = time()
+                    tracker.set_ts("last", now)
+                    # visiting resume list refreshes session as well
+                    tracker.set_ts("login", now)
+            except KeyboardInterrupt:
+                raise
+            except Exception as exc:
+                logger.exception("Event %s handling failed: %s", what.name, str(exc))
+    finally:
+        for signum, prev_handler in signals:
+            loop.remove_signal_handler(signum)
+            signal.signal(signum, prev_handler)
 
 def sig_handler(signum, frame):
     raise KeyboardInterrupt
@@ -385,6 +571,7 @@ def main():
     setup_logger("REFRESH", args.verbosity)
     setup_logger("EVLOOP", args.verbosity)
     setup_logger("GUARD", args.verbosity)
+    setup_logger("POOL", args.verbosity)
 
     screenshot_dir = os.path.join(args.data_dir, "screenshots")
     os.makedirs(screenshot_dir, mode=0o700, exist_ok=True)
@@ -392,7 +579,10 @@ def main():
     browser_factory = BrowserFactory(profile_dir,
                                      screenshot_dir,
                                      args.browser.value,
-                                     args.cmd is Command.update)
+                                     args.cmd is Command.update,
+                                     os.path.join(args.data_dir,
+                                                  "chromedriver_path"))
+    pool = BrowserPool(browser_factory)
     db_path = os.path.join(args.data_dir, 'updater.db')
     tracker = UpdateTracker(db_path)
     signal.signal(signal.SIGTERM, sig_handler)
@@ -402,20 +592,28 @@ def main():
             mainlogger.info("Login mode. Please enter your credentials in opened "
                             "browser window.")
             try:
-                with managed_browser(browser_factory) as browser:
+                with managed_browser(pool) as browser:
                     login(browser, MANUAL_LOGIN_TIMEOUT)
-                tracker.login(time())
+                tracker.set_ts("login", time())
             except KeyboardInterrupt:
                 mainlogger.warning("Interrupted!")
         elif args.cmd is Command.update:
             mainlogger.info("Update mode. Running headless browser.")
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
             try:
-                update_loop(browser_factory, tracker, args.timeout)
+                loop.run_until_complete(update_loop(pool, tracker, args.timeout))
             except KeyboardInterrupt:
                 pass
             finally:
                 mainlogger.info("Shutting down...")
+                if hasattr(loop, "shutdown_asyncgens"):
+                    loop.run_until_complete(loop.shutdown_asyncgens())
+                if hasattr(loop, "shutdown_default_executor"):
+                    loop.run_until_complete(loop.shutdown_default_executor())
+                loop.close()
     finally:
+        pool.close()
         tracker.close()
 
 if __name__ == "__main__":